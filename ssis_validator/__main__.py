@@ -1,9 +1,11 @@
 import argparse
 import logging
+import os
 import sys
 from pathlib import Path
 from typing import List
 
+import colorama
 import crayons
 
 from ssis_validator import Mode, ValidationPipeline
@@ -27,12 +29,31 @@ def print_mode_info(mode: Mode) -> None:
     print()
     if mode.is_repo:
         logger.info("o  Mode: Repository")
-        logger.info(f"o  Looking for staged projects in {mode.directories[0]}")
+        logger.info(
+            "o  Looking for staged projects in %s", mode.directories[0]
+        )
     else:
         logger.info("o  Mode: Directory")
 
 
 def main() -> None:
+    # Console setup belongs to the CLI, importing the package stays silent.
+    # colorama wraps sys.stderr, so it has to run before the log handler.
+    colorama.init()
+    log_level = os.environ.get("SSIS_VALIDATOR_LOG", "INFO").upper()
+    # getLevelName() maps known level names to their number
+    known_level = isinstance(logging.getLevelName(log_level), int)
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(lineno)d:%(name)s: %(message)s",
+        level=log_level if known_level else logging.INFO,
+        datefmt="%H:%M:%S",
+        stream=sys.stderr,
+    )
+    if not known_level:
+        logger.warning(
+            "o  Unknown SSIS_VALIDATOR_LOG level %s, using INFO", log_level
+        )
+
     parser = argparse.ArgumentParser(
         prog="ssis_validator",
         description="Validates SSIS Package XML file to ensure consistent"
@@ -1,28 +1,67 @@
+import dbm
+import io
 import logging
-import sys
+import os
+import shelve
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, List, Optional, Union
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import colorama
 import crayons
-import git
 from lxml import etree
 
-colorama.init()
+logger = logging.getLogger("validator")
 
-logging.basicConfig(
-    format="%(asctime)s %(levelname)s %(lineno)d:%(name)s: %(message)s",
-    level=logging.DEBUG,
-    datefmt="%H:%M:%S",
-    stream=sys.stderr,
-)
+logging.getLogger("matplotlib").disabled = True
 
-logger = logging.getLogger("validator")
+_XML_PARSER_OPTIONS = {
+    "remove_blank_text": True,
+    "remove_comments": True,
+    "huge_tree": True,
+    "collect_ids": False,
+    "resolve_entities": False,
+    "no_network": True,
+}
+
+# lxml serialises parsing on a shared parser, so keep one per thread
+_xml_parsers = threading.local()
+
+
+def _xml_parser() -> etree.XMLParser:
+    parser = getattr(_xml_parsers, "parser", None)
+    if parser is None:
+        parser = _xml_parsers.parser = etree.XMLParser(**_XML_PARSER_OPTIONS)
+    return parser
+
+
+_GREEN = colorama.Fore.GREEN
+_RED = colorama.Fore.RED
+_RESET = colorama.Fore.RESET
+
+# DTSX tag and attribute names in Clark notation
+_DTS = "{www.microsoft.com/SqlServer/Dts}"
+_DTS_EXECUTABLE = _DTS + "Executable"
+_DTS_CONNECTION_MANAGERS = _DTS + "ConnectionManagers"
+_DTS_CONNECTION_MANAGER = _DTS + "ConnectionManager"
+_DTS_OBJECT_DATA = _DTS + "ObjectData"
+_DTS_OBJECT_NAME = _DTS + "ObjectName"
+_DTS_PROTECTION_LEVEL = _DTS + "ProtectionLevel"
+_DTS_LAST_MODIFIED_PRODUCT_VERSION = _DTS + "LastModifiedProductVersion"
+_DTS_DELAY_VALIDATION = _DTS + "DelayValidation"
+_DTS_FORCE_EXECUTION_RESULT = _DTS + "ForceExecutionResult"
+
+# DTPROJ manifest names in Clark notation
+_SSIS = "{www.microsoft.com/SqlServer/SSIS}"
+_SSIS_PROTECTION_LEVEL = _SSIS + "ProtectionLevel"
 
-for module in "git.cmd", "git.util", "matplotlib":
-    logging.getLogger(module).disabled = True
 
 class Mode:
+    __slots__ = ("name", "directories", "is_repo")
+
     def __init__(
         self, name: str, directories: List[Path], is_repo: bool
     ) -> None:
@@ -31,11 +70,21 @@ class Mode:
         self.is_repo = is_repo
 
 class SSISProject:
+    __slots__ = (
+        "name",
+        "path",
+        "packages",
+        "incorrectly_linked",
+        "target_server_version",
+        "protection_level",
+        "deployment_model",
+    )
+
     def __init__(
         self,
         name,
         path,
-        packages=[],
+        packages=None,
         incorrectly_linked=False,
         target_server_version=None,
         protection_level=None,
@@ -43,14 +92,32 @@ class SSISProject:
     ):
         self.name = name
         self.path = path
-        self.packages = packages
+        self.packages = [] if packages is None else packages
         self.incorrectly_linked = incorrectly_linked
         self.target_server_version = target_server_version
         self.protection_level = protection_level
         self.deployment_model = deployment_model
 
 
+class DtsxFields(NamedTuple):
+    last_modified_version: Optional[int]
+    protection_level: Optional[int]
+    bix_con_name: Optional[str]
+    bix_option_continue_exec: Optional[str]
+    bix_option_no_report_fail: Optional[str]
+
+
 class SSISPackage:
+    __slots__ = (
+        "name",
+        "path",
+        "last_modified_version",
+        "protection_level",
+        "bix_con_name",
+        "bix_option_continue_exec",
+        "bix_option_no_report_fail",
+    )
+
     def __init__(
         self,
         name,
@@ -79,16 +146,20 @@ class SSISPackage:
 
 
 class Validation:
+    __slots__ = ("successful", "message")
+
     def __init__(self, successful=False, message=None):
         self.successful = successful
         self.message = message
 
     def __str__(self):
-        color = crayons.green if self.successful else crayons.red
-        return str(color(self.message))
+        color = _GREEN if self.successful else _RED
+        return f"{color}{self.message}{_RESET}"
 
 
 class ValidationResult:
+    __slots__ = ("name", "path", "result")
+
     def __init__(self, name, path, result):
         self.name = name
         self.path = path
@@ -134,6 +205,33 @@ class ValidationPipeline:
     BIXPRESS_CONNECTION_NAME = "OLEDB_BIxPress_1"
     ERROR_EVENT_NAME = "SSISOpsEhObj_Package_OnError"
 
+    CACHE_DIRECTORY = Path(".ssis_validator_cache")
+    # Bump whenever the fields extracted from a DTSX file or the layout
+    # of a cache entry change
+    DTSX_CACHE_VERSION = 2
+
+    SSIS_NAMESPACE = {"SSIS": "www.microsoft.com/SqlServer/SSIS"}
+    DTS_NAMESPACE = {"DTS": "www.microsoft.com/SqlServer/Dts"}
+
+    # DTPROJ expressions
+    _XP_TARGET_VER = etree.XPath(
+        "/Project/Configurations/Configuration/Options/TargetServerVersion"
+    )
+    _XP_DEPLOY_MODEL = etree.XPath("/Project/DeploymentModel")
+    _XP_MANIFEST = etree.XPath(
+        "/Project/DeploymentModelSpecificContent/Manifest/SSIS:Project[1]",
+        namespaces=SSIS_NAMESPACE,
+    )
+    _XP_PACKAGE_NAMES = etree.XPath(
+        "SSIS:Packages/SSIS:Package/@SSIS:Name", namespaces=SSIS_NAMESPACE
+    )
+
+    # DTSX expressions, evaluated relative to a streamed element
+    _XP_BIX_CONN = etree.XPath(
+        "DTS:ObjectData/DTS:ConnectionManager/@DTS:ConnectionString",
+        namespaces=DTS_NAMESPACE,
+    )
+
     def __init__(self, mode: Mode) -> None:
         self.mode: Mode = mode
         self.validated_projects: List[Any] = []
@@ -153,14 +251,32 @@ class ValidationPipeline:
             raise
 
     def _get_dir_dtproj_files(self, directories: List[Path]) -> List[Path]:
-        projects = []
+        projects: List[Path] = []
         for directory in directories:
-            if not directory.exists():
+            # Also rejects a file, which os.scandir() cannot walk
+            if not directory.is_dir():
                 raise CIException(f"Invalid folder specified: {directory}")
-            for dtproj in directory.rglob("*.dtproj"):
-                projects.append(dtproj)
+            projects.extend(self._find_dtproj_files(directory))
         return projects
 
+    @staticmethod
+    def _find_dtproj_files(directory: Path) -> Iterator[Path]:
+        try:
+            entries = os.scandir(directory)
+        except PermissionError:
+            # Unreadable directories are skipped, as rglob() did
+            return
+
+        # DirEntry caches the file type, so no stat() per entry
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from ValidationPipeline._find_dtproj_files(
+                        Path(entry.path)
+                    )
+                elif entry.name.endswith(".dtproj"):
+                    yield Path(entry.path)
+
     def _get_repo_changes(self, current_directory: Path) -> List[Path]:
         if not (current_directory / ".git").exists():
             raise CIException(
@@ -171,10 +287,11 @@ class ValidationPipeline:
         changed_projects = set()
 
         def find_dtproj(path):
-            if path == current_directory:
+            # rglob() yielded nothing for directories removed by the change
+            if path == current_directory or not path.is_dir():
                 return
             else:
-                dtproj_files = path.rglob("*.dtproj")
+                dtproj_files = self._find_dtproj_files(path)
                 if dtproj_files:
                     for dtproj in dtproj_files:
                         changed_projects.add(dtproj)
@@ -182,8 +299,31 @@ class ValidationPipeline:
                 else:
                     find_dtproj(path.parent)
         
-        for x in git.Repo(current_directory).index.diff("HEAD"):
-            blob_path = current_directory / Path(x.a_path)
+        try:
+            staged = subprocess.run(
+                [
+                    "git",
+                    "-C",
+                    os.fspath(current_directory),
+                    "diff",
+                    "--cached",
+                    "--name-only",
+                    "-z",
+                    "HEAD",
+                ],
+                capture_output=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            # Git explains the failure on stderr, the exit status does not
+            reason = e.stderr.decode(errors="replace").strip() or e
+            raise CIException(f"Unable to read the staged changes: {reason}")
+        except OSError as e:
+            raise CIException(f"Unable to read the staged changes: {e}")
+
+        staged_paths = os.fsdecode(staged.stdout).split("\0")
+        for staged_path in filter(None, staged_paths):
+            blob_path = current_directory / Path(staged_path)
             if blob_path.suffix == ".dtproj":
                 changed_projects.add(blob_path)
             else:
@@ -202,9 +342,9 @@ class ValidationPipeline:
         return dtproj_files
 
     @staticmethod
-    def _parse_dtsx_protection(xpath):
+    def _parse_dtsx_protection(value):
         try:
-            protection_level = None if not xpath else int(xpath[0])
+            protection_level = None if not value else int(value)
             protection_level = (
                 protection_level if protection_level is not None else 1
             )
@@ -214,10 +354,10 @@ class ValidationPipeline:
         return protection_level
 
     @staticmethod
-    def _parse_dtsx_modified_version(xpath):
+    def _parse_dtsx_modified_version(value):
         try:
             last_modified_version = (
-                None if not xpath else int(xpath[0].split(".")[0])
+                None if not value else int(value.split(".")[0])
             )
         except TypeError:
             return 0
@@ -225,39 +365,30 @@ class ValidationPipeline:
         return last_modified_version
 
     @staticmethod
-    def _read_xml_file(path, encoding):
+    def _read_xml_file(path):
         try:
-            with path.open("r", encoding=encoding) as f:
-                parsed_xml = etree.fromstring(f.read())
-        except ValueError:
-            with path.open("rb") as f:
-                parsed_xml = etree.fromstring(f.read())
+            # open() raises the specific OSError subclass, lxml does not
+            with open(path, "rb") as xml_file:
+                parsed_xml = etree.parse(xml_file, _xml_parser()).getroot()
+        except etree.XMLSyntaxError as e:
+            raise CIException(f"{path}: {e}")
         except FileNotFoundError:
             parsed_xml = ""
+        except OSError as e:
+            raise CIException(f"{path}: {e}")
 
         return parsed_xml
 
     @staticmethod
     def _parse_dtproj_file(dtproj: SSISProject) -> SSISProject:
-        parsed_xml = ValidationPipeline._read_xml_file(dtproj.path, "utf-8")
+        parsed_xml = ValidationPipeline._read_xml_file(dtproj.path)
 
         if len(parsed_xml) == 0:
-            raise FileNotFoundError("No DTPROJ file was found")
-
-        ssis_namespace = {"SSIS": "www.microsoft.com/SqlServer/SSIS"}
+            # Projects are parsed together, so name the one that is missing
+            raise FileNotFoundError(f"No DTPROJ file was found: {dtproj.path}")
 
         # SSISProject.target_server_version
-        deployment_version = parsed_xml.xpath(
-            "/".join(
-                [
-                    "//Configurations",
-                    "Configuration",
-                    "Options",
-                    "TargetServerVersion",
-                ]
-            ),
-            namespaces=parsed_xml.nsmap,
-        )
+        deployment_version = ValidationPipeline._XP_TARGET_VER(parsed_xml)
         dtproj_target_server_version = (
             None if not deployment_version else deployment_version[0].text
         )
@@ -271,43 +402,29 @@ class ValidationPipeline:
         # )
 
         # SSISProject.deployment_model
-        deployment_model = parsed_xml.xpath("//DeploymentModel")
+        deployment_model = ValidationPipeline._XP_DEPLOY_MODEL(parsed_xml)
         dtproj_deployment_model = (
             None if not deployment_model else deployment_model[0].text
         )
 
+        # Both the protection level and the packages live on the manifest
+        manifest_tree = ValidationPipeline._XP_MANIFEST(parsed_xml)
+        manifest = None if not manifest_tree else manifest_tree[0]
+
         # SSISProject.protection_level
-        protection_level_tree = parsed_xml.xpath(
-            "/".join(
-                [
-                    "//DeploymentModelSpecificContent",
-                    "Manifest",
-                    "SSIS:Project",
-                    "@SSIS:ProtectionLevel",
-                ]
-            ),
-            namespaces=ssis_namespace,
-        )
         dtproj_protection_level = (
-            None if not protection_level_tree else protection_level_tree[0]
+            None if manifest is None else manifest.get(_SSIS_PROTECTION_LEVEL)
         )
 
         # SSISProject.packages
+        dtproj_package_names = (
+            []
+            if manifest is None
+            else ValidationPipeline._XP_PACKAGE_NAMES(manifest)
+        )
         dtproj_packages = [
             SSISPackage(Path(dtsx).name, dtproj.path.parent / Path(dtsx))
-            for dtsx in parsed_xml.xpath(
-                "/".join(
-                    [
-                        "//DeploymentModelSpecificContent",
-                        "Manifest",
-                        "SSIS:Project",
-                        "SSIS:Packages",
-                        "SSIS:Package",
-                        "@SSIS:Name",
-                    ]
-                ),
-                namespaces=ssis_namespace,
-            )
+            for dtsx in dtproj_package_names
         ]
 
         dtproj_incorrectly_linked = any(
@@ -327,117 +444,237 @@ class ValidationPipeline:
     def _process_dtproj_files(
         self, projects: List[SSISProject]
     ) -> List[SSISProject]:
-        parsed_projects = []
         for dtproj in projects:
-            logger.info(f"o  Processing: {dtproj.name}")
-            try:
-                parsed_projects.append(self._parse_dtproj_file(dtproj))
-            except:
-                raise
+            logger.info("o  Processing: %s", dtproj.name)
+
+        # lxml releases the GIL while parsing, threads are enough here
+        with ThreadPoolExecutor() as executor:
+            parsed_projects = list(
+                executor.map(ValidationPipeline._parse_dtproj_file, projects)
+            )
+
         self._process_dtsx_files(parsed_projects)
         return parsed_projects
 
     @staticmethod
-    def _parse_dtsx_file(package: SSISPackage) -> SSISPackage:
+    def _read_dtsx_fields(source: Any) -> DtsxFields:
+        protection_level = None
+        last_modified_version = None
+        bix_con_name = None
+        bix_option_continue_exec = None
+        bix_option_no_report_fail = None
+
+        # Single streaming pass over the executables and connection
+        # managers, dropping every subtree once it has been inspected
+        context = etree.iterparse(
+            source,
+            events=("end",),
+            tag=(_DTS_EXECUTABLE, _DTS_CONNECTION_MANAGER),
+            **_XML_PARSER_OPTIONS,
+        )
+        for _, element in context:
+            parent = element.getparent()
+
+            if parent is None:
+                if element.tag == _DTS_EXECUTABLE:
+                    # SSISPackage.protection_level
+                    protection_level = element.get(_DTS_PROTECTION_LEVEL)
+                    # SSISPackage.last_modified_version
+                    last_modified_version = element.get(
+                        _DTS_LAST_MODIFIED_PRODUCT_VERSION
+                    )
+                continue
+
+            grandparent = parent.getparent()
+
+            if element.tag == _DTS_EXECUTABLE:
+                # SSISPackage.bix_option_no_report_fail
+                if (
+                    bix_option_no_report_fail is None
+                    and element.get(_DTS_OBJECT_NAME)
+                    == ValidationPipeline.ERROR_EVENT_NAME
+                ):
+                    bix_option_no_report_fail = element.get(
+                        _DTS_FORCE_EXECUTION_RESULT
+                    )
+
+            elif parent.tag == _DTS_OBJECT_DATA:
+                # Inner connection manager, read with its owner below
+                continue
+
+            elif (
+                parent.tag == _DTS_CONNECTION_MANAGERS
+                and grandparent is not None
+                and grandparent.getparent() is None
+                and element.get(_DTS_OBJECT_NAME)
+                == ValidationPipeline.BIXPRESS_CONNECTION_NAME
+            ):
+                # SSISPackage.bix_option_continue_exec
+                if bix_option_continue_exec is None:
+                    bix_option_continue_exec = element.get(
+                        _DTS_DELAY_VALIDATION
+                    )
+
+                # SSISPackage.bix_con_name
+                if bix_con_name is None:
+                    connection_string = ValidationPipeline._XP_BIX_CONN(
+                        element
+                    )
+                    if connection_string:
+                        bix_con_name = connection_string[0]
+
+            # Inspected subtrees and everything before them are done with
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del parent[0]
+
+        protection_level = ValidationPipeline._parse_dtsx_protection(
+            protection_level
+        )
+
+        # Encrypted packages carry a default namespace on the root
+        root = context.root
+        if None in root.nsmap:
+            if next(root.iter("{*}EncryptedData"), None) is not None:
+                protection_level = 3
+
+        return DtsxFields(
+            ValidationPipeline._parse_dtsx_modified_version(
+                last_modified_version
+            ),
+            protection_level,
+            bix_con_name,
+            bix_option_continue_exec,
+            bix_option_no_report_fail,
+        )
+
+    @staticmethod
+    def _read_dtsx_file(package: SSISPackage) -> Optional[DtsxFields]:
         try:
-            parsed_xml = ValidationPipeline._read_xml_file(
-                package.path, "utf-8-sig"
-            )
+            # open() raises the specific OSError subclass, lxml does not
+            with open(package.path, "rb") as dtsx:
+                return ValidationPipeline._read_dtsx_fields(dtsx)
+        except etree.XMLSyntaxError as e:
+            # lxml errors hold an error log that cannot leave a worker
+            raise CIException(f"{package.path}: {e}")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise CIException(f"{package.path}: {e}")
 
-            if not len(parsed_xml):
-                return package
+    @staticmethod
+    def _parse_dtsx_file(package: SSISPackage) -> SSISPackage:
+        fields = ValidationPipeline._read_dtsx_file(package)
+        if fields is not None:
+            ValidationPipeline._set_dtsx_fields(package, fields)
 
-            xml_namespace = parsed_xml.nsmap
+        return package
 
-            # SSISPackage.protection_level
-            package.protection_level = ValidationPipeline._parse_dtsx_protection(
-                parsed_xml.xpath(
-                    "//DTS:Executable/@DTS:ProtectionLevel",
-                    namespaces=xml_namespace,
-                )
-            )
+    @staticmethod
+    def _parse_dtsx_bytes(package: SSISPackage, data: bytes) -> SSISPackage:
+        try:
+            fields = ValidationPipeline._read_dtsx_fields(io.BytesIO(data))
+        except etree.XMLSyntaxError as e:
+            raise CIException(f"{package.path}: {e}")
 
-            # SSISPackage.last_modified_version
-            package.last_modified_version = ValidationPipeline._parse_dtsx_modified_version(
-                parsed_xml.xpath(
-                    f"//DTS:Executable/@DTS:LastModifiedProductVersion",
-                    namespaces=xml_namespace,
-                )
-            )
+        ValidationPipeline._set_dtsx_fields(package, fields)
+        return package
 
-            # SSISPackage.bix_con_name
-            bixpress_conn_xpath = parsed_xml.xpath(
-                "/".join(
-                    [
-                        "//DTS:ConnectionManager[@DTS:ObjectName='{}']".format(
-                            ValidationPipeline.BIXPRESS_CONNECTION_NAME
-                        ),
-                        "DTS:ObjectData",
-                        "DTS:ConnectionManager",
-                        "@DTS:ConnectionString",
-                    ]
-                ),
-                namespaces=xml_namespace,
-            )
-            package.bix_con_name = (
-                None if not bixpress_conn_xpath else bixpress_conn_xpath[0]
-            )
+    @staticmethod
+    def _dtsx_cache_key(package: SSISPackage) -> str:
+        # One entry per package, a changed file overwrites its own entry
+        return "|".join(
+            [
+                str(ValidationPipeline.DTSX_CACHE_VERSION),
+                os.fspath(package.path.resolve()),
+            ]
+        )
 
-            # SSISPackage.bix_option_continue_exec
-            bixpress_delay_validation_xpath = parsed_xml.xpath(
-                "/".join(
-                    [
-                        "//DTS:ConnectionManager[@DTS:ObjectName='{}']".format(
-                            ValidationPipeline.BIXPRESS_CONNECTION_NAME
-                        ),
-                        "@DTS:DelayValidation",
-                    ]
-                ),
-                namespaces=xml_namespace,
-            )
-            package.bix_option_continue_exec = (
-                None
-                if not bixpress_delay_validation_xpath
-                else bixpress_delay_validation_xpath[0]
-            )
+    @staticmethod
+    def _dtsx_cache_stamp(package: SSISPackage) -> Optional[Tuple[int, int]]:
+        try:
+            stat = package.path.stat()
+        except OSError:
+            return None
 
-            # SSISPackage.bix_option_no_report_fail
-            bixpress_onerror_xpath = parsed_xml.xpath(
-                "/".join(
-                    [
-                        "//DTS:Executable[@DTS:ObjectName='{}']".format(
-                            ValidationPipeline.ERROR_EVENT_NAME
-                        ),
-                        "@DTS:ForceExecutionResult",
-                    ]
-                ),
-                namespaces=xml_namespace,
-            )
-            package.bix_option_no_report_fail = (
-                None
-                if not bixpress_onerror_xpath
-                else bixpress_onerror_xpath[0]
-            )
-        except TypeError:
-            if etree.SubElement(parsed_xml, "EncryptedData") is not None:
-                package.protection_level = 3
+        return stat.st_mtime_ns, stat.st_size
 
-        return SSISPackage(
-            package.name,
-            package.path,
+    @staticmethod
+    def _set_dtsx_fields(package: SSISPackage, fields: DtsxFields) -> None:
+        (
             package.last_modified_version,
             package.protection_level,
             package.bix_con_name,
             package.bix_option_continue_exec,
             package.bix_option_no_report_fail,
-        )
+        ) = fields
+
+    @contextmanager
+    def _open_dtsx_cache(self) -> Iterator[Any]:
+        try:
+            self.CACHE_DIRECTORY.mkdir(exist_ok=True)
+            # The cache lives in the validated repository, keep it out of Git
+            gitignore = self.CACHE_DIRECTORY / ".gitignore"
+            if not gitignore.exists():
+                gitignore.write_text("*\n")
+            cache = shelve.open(os.fspath(self.CACHE_DIRECTORY / "dtsx"))
+        except (OSError, *dbm.error):
+            logger.debug("DTSX cache is unavailable, parsing every package")
+            yield {}
+            return
+
+        with cache:
+            yield cache
 
     def _process_dtsx_files(self, projects: List[SSISProject]) -> None:
-        for dtproj in projects:
-            packages = []
-            for package in dtproj.packages:
-                packages.append(ValidationPipeline._parse_dtsx_file(package))
-            dtproj.packages = packages
+        slots = [
+            (dtproj.packages, index)
+            for dtproj in projects
+            for index in range(len(dtproj.packages))
+        ]
+        if not slots:
+            return
+
+        with self._open_dtsx_cache() as cache:
+            # Unchanged files reuse the fields extracted on a previous run
+            misses = []
+            for packages, index in slots:
+                stamp = self._dtsx_cache_stamp(packages[index])
+                if stamp is None:
+                    # Missing packages are left unparsed, as before
+                    continue
+
+                key = self._dtsx_cache_key(packages[index])
+                entry = cache.get(key)
+                if entry is None or entry[:2] != stamp:
+                    misses.append((packages, index, key, stamp))
+                else:
+                    self._set_dtsx_fields(packages[index], entry[2])
+
+            if not misses:
+                return
+
+            pending = [packages[index] for packages, index, _, _ in misses]
+            if len(pending) == 1:
+                # A single changed package is not worth starting a pool
+                results = [ValidationPipeline._read_dtsx_file(pending[0])]
+            else:
+                with ProcessPoolExecutor() as executor:
+                    results = list(
+                        executor.map(
+                            ValidationPipeline._read_dtsx_file, pending
+                        )
+                    )
+
+            for (packages, index, key, stamp), fields in zip(
+                misses, results
+            ):
+                if fields is None:
+                    # Removed since it was checked, left unparsed and uncached
+                    continue
+
+                self._set_dtsx_fields(packages[index], fields)
+                cache[key] = (*stamp, fields)
 
     def validate_dtproj_server_version(
         self, project: SSISProject
@@ -669,19 +906,25 @@ class ValidationPipeline:
 
         return all_validations
 
+    @staticmethod
+    def _order_results(results: List[Validation]) -> List[Validation]:
+        # Successful checks first, in their original order
+        return [result for result in results if result.successful] + [
+            result for result in results if not result.successful
+        ]
+
     def print_validation_result(self) -> None:
         print()
         project_validation_successful = True
         for project, packages in self.validated_projects:
             print("-" * 80 + "\n")
-            logger.info(crayons.cyan(f"o  Validating {project.name}"))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(crayons.cyan(f"o  Validating {project.name}"))
             print()
-            logger.info(f"o  Validating {project.path}")
+            logger.info("o  Validating %s", project.path)
             print()
 
-            for result in sorted(
-                project.result, key=lambda x: not x.successful
-            ):
+            for result in self._order_results(project.result):
                 print(result)
 
                 if not result.successful:
@@ -692,11 +935,9 @@ class ValidationPipeline:
 
             packages_validation_successful = True
             for package in packages:
-                logger.info(f"o  Validating {package.path}")
+                logger.info("o  Validating %s", package.path)
                 print()
-                for result in sorted(
-                    package.result, key=lambda x: not x.successful
-                ):
+                for result in self._order_results(package.result):
                     print(result)
                     if not result.successful:
                         packages_validation_successful = False
@@ -704,14 +945,14 @@ class ValidationPipeline:
             if packages:
                 print()
 
-            if packages_validation_successful and project_validation_successful:
-                logger.info(
-                    crayons.cyan(f"o  Successfully validated: {project.name}")
-                )
-            else:
-                logger.info(
-                    crayons.cyan(f"o  Failed validating: {project.name}")
+            if logger.isEnabledFor(logging.INFO):
+                status = (
+                    "Successfully validated"
+                    if packages_validation_successful
+                    and project_validation_successful
+                    else "Failed validating"
                 )
+                logger.info(crayons.cyan(f"o  {status}: {project.name}"))
 
             print()
 
@@ -1,175 +1,356 @@
+import os
 import pathlib
+import shelve
+from xml.sax.saxutils import escape, quoteattr
 
-import lxml.etree
 import pytest
 
-import ssis_validator
+from ssis_validator import Mode, SSISPackage, SSISProject, ValidationPipeline
+from ssis_validator.ssis_validator import CIException
+
+_DTSX_TEMPLATE = """\
+<?xml version='1.0' encoding='utf-8'?>
+<DTS:Executable xmlns:DTS="www.microsoft.com/SqlServer/Dts"
+    DTS:ProtectionLevel={protection_level}
+    DTS:LastModifiedProductVersion={last_mod_prod_ver}>
+  <DTS:ConnectionManagers>
+    <DTS:ConnectionManager DTS:DelayValidation="True" DTS:ObjectName={conn_name}>
+      <DTS:ObjectData>
+        <DTS:ConnectionManager DTS:ConnectionString={conn_string}/>
+      </DTS:ObjectData>
+    </DTS:ConnectionManager>
+  </DTS:ConnectionManagers>
+  <DTS:EventHandlers>
+    <DTS:EventHandler>
+      <DTS:Executables>
+        <DTS:Executable DTS:ForceExecutionResult="0"
+            DTS:ObjectName="SSISOpsEhObj_Package_OnError"/>
+      </DTS:Executables>
+    </DTS:EventHandler>
+  </DTS:EventHandlers>
+</DTS:Executable>
+"""
+
+_DTPROJ_TEMPLATE = """\
+<?xml version='1.0' encoding='utf-8'?>
+<Project xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <DeploymentModel>Project</DeploymentModel>
+  <ProductVersion>14.0.1000.169</ProductVersion>
+  <DeploymentModelSpecificContent>
+    <Manifest>
+      <SSIS:Project xmlns:SSIS="www.microsoft.com/SqlServer/SSIS"
+          SSIS:ProtectionLevel={protection_level}>
+        <SSIS:Packages>
+          <SSIS:Package SSIS:Name={package_name} SSIS:EntryPoint="1"/>
+        </SSIS:Packages>
+      </SSIS:Project>
+    </Manifest>
+  </DeploymentModelSpecificContent>
+  <Configurations>
+    <Configuration>
+      <Name>Development</Name>
+      <Options>
+        <OutputPath>bin</OutputPath>
+        <TargetServerVersion>{target_server_version}</TargetServerVersion>
+      </Options>
+    </Configuration>
+  </Configurations>
+</Project>
+"""
+
+
+def _dtsx_bytes(protection_level, last_mod_prod_ver, conn_name, conn_server):
+    return _DTSX_TEMPLATE.format(
+        protection_level=quoteattr(protection_level),
+        last_mod_prod_ver=quoteattr(last_mod_prod_ver),
+        conn_name=quoteattr(conn_name),
+        conn_string=quoteattr(
+            f"Data Source={conn_server};Initial Catalog=BIxPress;"
+        ),
+    ).encode("utf-8")
+
+
+def _dtproj_bytes(protection_level, package_name, target_server_version):
+    return _DTPROJ_TEMPLATE.format(
+        protection_level=quoteattr(protection_level),
+        package_name=quoteattr(package_name),
+        target_server_version=escape(target_server_version),
+    ).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def shared_bytes():
+    return {
+        "dtsx": _dtsx_bytes(
+            "2", "14.0.3008.28", "OLEDB_BIxPress_1", "server_name"
+        ),
+        "dtproj": _dtproj_bytes(
+            "DontSaveSensitive", "Package.dtsx", "SQLServer2014"
+        ),
+    }
+
+
+@pytest.fixture(scope="session")
+def dtproj_file_1(tmp_path_factory, shared_bytes):
+    project_dtproj = tmp_path_factory.mktemp("ssis_project") / "Project.dtproj"
+    project_dtproj.write_bytes(shared_bytes["dtproj"])
 
+    return project_dtproj
 
-def dtsx_file(protection_level, last_mod_prod_ver, conn_name, conn_server):
-    # DTS Executable
-    def dts(
-        prop, nsmap={"DTS": "www.microsoft.com/SqlServer/Dts"}, ns_name="DTS"
-    ):
-        return f"{{{nsmap[ns_name]}}}{prop}"
 
-    ssis_project = lxml.etree.Element(
-        dts("Executable"),
-        attrib={
-            dts("ProtectionLevel"): protection_level,
-            dts("LastModifiedProductVersion"): last_mod_prod_ver,
-        },
-        nsmap={"DTS": "www.microsoft.com/SqlServer/Dts"},
-    )
+def test_dtproj_parsing_incorrectly_linked(dtproj_file_1):
+    dtproj_path = dtproj_file_1
+    stem = dtproj_path.stem
+    dtproj = SSISProject(stem, dtproj_path)
 
-    # Connection Managers
-    connection_managers = lxml.etree.SubElement(
-        ssis_project, dts("ConnectionManagers")
-    )
-    connection_manager = lxml.etree.SubElement(
-        connection_managers,
-        dts("ConnectionManager"),
-        attrib={dts("DelayValidation"): "True", dts("ObjectName"): conn_name},
-    )
-    object_data = lxml.etree.SubElement(connection_manager, dts("ObjectData"))
-    lxml.etree.SubElement(
-        object_data,
-        dts("ConnectionManager"),
-        attrib={
-            dts("ConnectionString"): ";".join(
-                (f"Data Source={conn_server}", "Initial Catalog=BIxPress;")
-            )
-        },
-    )
+    ssis_project = ValidationPipeline._parse_dtproj_file(dtproj)
 
-    # Event Handlers
-    event_handlers = lxml.etree.SubElement(ssis_project, dts("EventHandlers"))
-    event_handler = lxml.etree.SubElement(event_handlers, dts("EventHandler"))
-    exectuables = lxml.etree.SubElement(event_handler, dts("Executables"))
-    lxml.etree.SubElement(
-        exectuables,
-        dts("Executable"),
-        attrib={
-            dts("ForceExecutionResult"): "0",
-            dts("ObjectName"): "SSISOpsEhObj_Package_OnError",
-        },
-    )
+    dtsx_path = dtproj_path.parent / "Package.dtsx"
+    ssis_packages = [SSISPackage(dtsx_path.name, dtsx_path)]
 
-    return lxml.etree.tostring(
-        ssis_project, xml_declaration=True, encoding="utf-8", pretty_print=True
-    )
+    assert ssis_project.name == stem
+    assert ssis_project.path == dtproj_path
+    assert ssis_project.packages == ssis_packages
+    assert ssis_project.incorrectly_linked == True
+    assert ssis_project.target_server_version == "SQLServer2014"
+    assert ssis_project.protection_level == "DontSaveSensitive"
 
 
-def dtproj_file(protection_level, package_name, target_server_version):
-    project = lxml.etree.Element(
-        "Project",
-        nsmap={
-            "xsd": "http://www.w3.org/2001/XMLSchema",
-            "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-        },
+def test_dtsx_parsing(shared_bytes):
+    dtsx_path = pathlib.PurePath("/virtual/Package.dtsx")
+    stem = dtsx_path.stem
+    ssis_package = SSISPackage(stem, dtsx_path)
+    dtsx = ValidationPipeline._parse_dtsx_bytes(
+        ssis_package, shared_bytes["dtsx"]
     )
 
-    deployment_model = lxml.etree.SubElement(project, "DeploymentModel")
-    deployment_model.text = "Project"
+    assert dtsx.name == stem
+    assert dtsx.path == dtsx_path
+    assert dtsx.last_modified_version == 14
+    assert dtsx.protection_level == 2
+    assert "server_name" in dtsx.bix_con_name
+    assert dtsx.bix_option_continue_exec == "True"
+    assert dtsx.bix_option_no_report_fail == "0"
+
 
-    product_version = lxml.etree.SubElement(project, "ProductVersion")
-    product_version.text = "14.0.1000.169"
+def test_dtproj_parsing_rejects_corrupt_projects(tmp_path, shared_bytes):
+    data = shared_bytes["dtproj"]
+    dtproj_path = tmp_path / "Project.dtproj"
+    dtproj_path.write_bytes(data[: len(data) // 2])
 
-    deployment_model_specific_content = lxml.etree.SubElement(
-        project, "DeploymentModelSpecificContent"
-    )
+    with pytest.raises(CIException, match="Project.dtproj"):
+        ValidationPipeline._parse_dtproj_file(
+            SSISProject(dtproj_path.stem, dtproj_path)
+        )
 
-    # Manifest
-    manifest = lxml.etree.SubElement(
-        deployment_model_specific_content, "Manifest"
-    )
-    nsmap = {"SSIS": "www.microsoft.com/SqlServer/SSIS"}
 
-    def ssis(
-        prop, nsmap={"SSIS": "www.microsoft.com/SqlServer/SSIS"}, ns_name="SSIS"
-    ):
-        return f"{{{nsmap[ns_name]}}}{prop}"
+def test_dtproj_parsing_names_missing_projects(tmp_path):
+    dtproj_path = tmp_path / "Project.dtproj"
 
-    ssis_project = lxml.etree.Element(
-        ssis("Project"),
-        attrib={ssis("ProtectionLevel"): protection_level},
-        nsmap=nsmap,
-    )
-    manifest.append(ssis_project)
-
-    # SSIS Packages
-    ssis_packages = lxml.etree.SubElement(ssis_project, ssis("Packages"))
-    lxml.etree.SubElement(
-        ssis_packages,
-        ssis("Package"),
-        attrib={ssis("Name"): package_name, ssis("EntryPoint"): "1"},
-    )
+    with pytest.raises(FileNotFoundError, match="Project.dtproj"):
+        ValidationPipeline._parse_dtproj_file(
+            SSISProject(dtproj_path.stem, dtproj_path)
+        )
 
-    # Configurations
-    configurations = lxml.etree.SubElement(project, "Configurations")
-    configuration = lxml.etree.SubElement(configurations, "Configuration")
-    configuration_name = lxml.etree.SubElement(configuration, "Name")
-    configuration_name.text = "Development"
-    configuration_options = lxml.etree.SubElement(configuration, "Options")
-    configuration_output_path = lxml.etree.SubElement(
-        configuration_options, "OutputPath"
-    )
-    configuration_output_path.text = "bin"
-    configuration_target_server_version = lxml.etree.SubElement(
-        configuration_options, "TargetServerVersion"
-    )
-    configuration_target_server_version.text = target_server_version
 
-    return lxml.etree.tostring(
-        project, xml_declaration=True, encoding="utf-8", pretty_print=True
-    )
+def test_dtproj_parsing_rejects_unreadable_projects(tmp_path):
+    # A directory named like a project exists but cannot be read
+    dtproj_path = tmp_path / "Project.dtproj"
+    dtproj_path.mkdir()
+
+    with pytest.raises(CIException, match="Project.dtproj"):
+        ValidationPipeline._parse_dtproj_file(
+            SSISProject(dtproj_path.stem, dtproj_path)
+        )
 
 
-@pytest.fixture
-def dtproj_file_1(tmpdir):
-    project_dtproj = tmpdir.mkdir("ssis_project").join("Project.dtproj")
-    project_dtproj.write(
-        dtproj_file("DontSaveSensitive", "Package.dtsx", "SQLServer2014")
+def test_dtsx_parsing_rejects_corrupt_packages(shared_bytes):
+    data = shared_bytes["dtsx"]
+    dtsx_path = pathlib.PurePath("/virtual/Package.dtsx")
+
+    # Truncated packages and non-XML input must not pass validation
+    for corrupt in (data[: len(data) // 2], b"not xml"):
+        with pytest.raises(CIException, match="Package.dtsx"):
+            ValidationPipeline._parse_dtsx_bytes(
+                SSISPackage(dtsx_path.stem, dtsx_path), corrupt
+            )
+
+
+def test_dtsx_parsing_rejects_unreadable_packages(tmp_path):
+    # A directory named like a package exists but cannot be read
+    dtsx_path = tmp_path / "Package.dtsx"
+    dtsx_path.mkdir()
+
+    with pytest.raises(CIException, match="Package.dtsx"):
+        ValidationPipeline._parse_dtsx_file(
+            SSISPackage(dtsx_path.stem, dtsx_path)
+        )
+
+
+def test_dtsx_parsing_connection_managers_root():
+    dtsx_path = pathlib.PurePath("/virtual/Package.dtsx")
+
+    dtsx = ValidationPipeline._parse_dtsx_bytes(
+        SSISPackage(dtsx_path.stem, dtsx_path),
+        b'<DTS:ConnectionManagers xmlns:DTS="www.microsoft.com/SqlServer/Dts">'
+        b'<DTS:ConnectionManager DTS:ObjectName="OLEDB_BIxPress_1"/>'
+        b"</DTS:ConnectionManagers>",
     )
 
-    return project_dtproj
+    assert dtsx.bix_con_name is None
+    assert dtsx.bix_option_continue_exec is None
 
 
-def test_dtproj_parsing_incorrectly_linked(tmpdir, dtproj_file_1):
-    dtproj_path = pathlib.Path(tmpdir) / dtproj_file_1
-    dtproj = ssis_validator.SSISProject(dtproj_path.stem, dtproj_path)
+def test_dtsx_parsing_encrypted_packages():
+    dtsx_path = pathlib.PurePath("/virtual/Package.dtsx")
 
-    ssis_project = ssis_validator.ValidationPipeline._parse_dtproj_file(dtproj)
+    encrypted = ValidationPipeline._parse_dtsx_bytes(
+        SSISPackage(dtsx_path.stem, dtsx_path),
+        b'<EncryptedData xmlns="http://www.w3.org/2001/04/xmlenc#">'
+        b"<CipherData><CipherValue>AAAA</CipherValue></CipherData>"
+        b"</EncryptedData>",
+    )
+    namespaced = ValidationPipeline._parse_dtsx_bytes(
+        SSISPackage(dtsx_path.stem, dtsx_path),
+        b'<Package xmlns="urn:example"><Data/></Package>',
+    )
 
-    dtsx_path = pathlib.Path(tmpdir) / "ssis_project" / "Package.dtsx"
-    ssis_packages = [ssis_validator.SSISPackage(dtsx_path.name, dtsx_path)]
+    assert encrypted.protection_level == 3
+    assert namespaced.protection_level != 3
 
-    assert ssis_project.name == dtproj_path.stem
-    assert ssis_project.path == dtproj_path
-    assert ssis_project.packages == ssis_packages
-    assert ssis_project.incorrectly_linked == True
-    assert ssis_project.target_server_version == "SQLServer2014"
-    assert ssis_project.protection_level == "DontSaveSensitive"
 
+def test_dtsx_cache_skips_unchanged_packages(
+    tmp_path, monkeypatch, shared_bytes
+):
+    monkeypatch.chdir(tmp_path)
+    dtsx_path = tmp_path / "Package.dtsx"
+    dtsx_path.write_bytes(shared_bytes["dtsx"])
+    dtproj_path = tmp_path / "Project.dtproj"
 
-@pytest.fixture
-def dtsx_file_1(tmpdir):
-    dtsx = tmpdir.mkdir("ssis_project_2").join("Package.dtsx")
-    test = dtsx_file("2", "14.0.3008.28", "OLEDB_BIxPress_1", "server_name")
-    dtsx.write(test)
+    pipeline = ValidationPipeline(Mode("Directory", [tmp_path], False))
 
-    return dtsx
+    def ssis_project():
+        return SSISProject(
+            dtproj_path.stem,
+            dtproj_path,
+            [SSISPackage(dtsx_path.stem, dtsx_path)],
+        )
 
+    pipeline._process_dtsx_files([ssis_project()])
 
-def test_dtsx_parsing(tmpdir, dtsx_file_1):
-    dtsx_path = pathlib.Path(tmpdir) / dtsx_file_1
-    ssis_package = ssis_validator.SSISPackage(dtsx_path.stem, dtsx_path)
-    dtsx = ssis_validator.ValidationPipeline._parse_dtsx_file(ssis_package)
+    def read_dtsx_file(package):
+        raise AssertionError(f"{package.name} should have been cached")
+
+    monkeypatch.setattr(
+        ValidationPipeline, "_read_dtsx_file", staticmethod(read_dtsx_file)
+    )
+
+    cached_project = ssis_project()
+    pipeline._process_dtsx_files([cached_project])
+    dtsx = cached_project.packages[0]
 
-    assert dtsx.name == dtsx_path.stem
-    assert dtsx.path == dtsx_path
     assert dtsx.last_modified_version == 14
     assert dtsx.protection_level == 2
     assert "server_name" in dtsx.bix_con_name
     assert dtsx.bix_option_continue_exec == "True"
     assert dtsx.bix_option_no_report_fail == "0"
+
+
+@pytest.mark.parametrize("error", [FileNotFoundError, PermissionError])
+def test_dtsx_cache_skips_failed_reads(
+    tmp_path, monkeypatch, shared_bytes, error
+):
+    monkeypatch.chdir(tmp_path)
+    dtsx_path = tmp_path / "Package.dtsx"
+    dtsx_path.write_bytes(shared_bytes["dtsx"])
+    dtproj_path = tmp_path / "Project.dtproj"
+
+    pipeline = ValidationPipeline(Mode("Directory", [tmp_path], False))
+
+    def ssis_project():
+        return SSISProject(
+            dtproj_path.stem,
+            dtproj_path,
+            [SSISPackage(dtsx_path.stem, dtsx_path)],
+        )
+
+    def read_dtsx_fields(source):
+        raise error(source.name)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            ValidationPipeline,
+            "_read_dtsx_fields",
+            staticmethod(read_dtsx_fields),
+        )
+        try:
+            pipeline._process_dtsx_files([ssis_project()])
+        except CIException:
+            pass
+
+    # The failed read left nothing behind, the unchanged file is parsed
+    retried_project = ssis_project()
+    pipeline._process_dtsx_files([retried_project])
+    dtsx = retried_project.packages[0]
+
+    assert dtsx.protection_level == 2
+    assert "server_name" in dtsx.bix_con_name
+
+
+def test_dtsx_cache_replaces_changed_packages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dtsx_path = tmp_path / "Package.dtsx"
+    dtproj_path = tmp_path / "Project.dtproj"
+
+    pipeline = ValidationPipeline(Mode("Directory", [tmp_path], False))
+
+    for last_mod_prod_ver in ("14.0.3008.28", "15.0.1"):
+        dtsx_path.write_bytes(
+            _dtsx_bytes("2", last_mod_prod_ver, "OLEDB_BIxPress_1", "server")
+        )
+        ssis_project = SSISProject(
+            dtproj_path.stem,
+            dtproj_path,
+            [SSISPackage(dtsx_path.stem, dtsx_path)],
+        )
+        pipeline._process_dtsx_files([ssis_project])
+
+    cache_directory = tmp_path / ValidationPipeline.CACHE_DIRECTORY
+    with shelve.open(os.fspath(cache_directory / "dtsx")) as cache:
+        assert len(cache) == 1
+
+    assert ssis_project.packages[0].last_modified_version == 15
+    assert (cache_directory / ".gitignore").read_text() == "*\n"
+
+
+def test_dtsx_pool_reports_corrupt_packages(
+    tmp_path, monkeypatch, shared_bytes
+):
+    monkeypatch.chdir(tmp_path)
+    data = shared_bytes["dtsx"]
+    dtsx_paths = [tmp_path / "Valid.dtsx", tmp_path / "Truncated.dtsx"]
+    dtproj_path = tmp_path / "Project.dtproj"
+
+    pipeline = ValidationPipeline(Mode("Directory", [tmp_path], False))
+
+    def ssis_project():
+        return SSISProject(
+            dtproj_path.stem,
+            dtproj_path,
+            [SSISPackage(dtsx.stem, dtsx) for dtsx in dtsx_paths],
+        )
+
+    # Two cache misses go through the process pool
+    dtsx_paths[0].write_bytes(data)
+    dtsx_paths[1].write_bytes(data[: len(data) // 2])
+    with pytest.raises(CIException, match="Truncated.dtsx"):
+        pipeline._process_dtsx_files([ssis_project()])
+
+    dtsx_paths[1].write_bytes(data)
+    parsed_project = ssis_project()
+    pipeline._process_dtsx_files([parsed_project])
+
+    for dtsx in parsed_project.packages:
+        assert dtsx.protection_level == 2
+        assert "server_name" in dtsx.bix_con_name